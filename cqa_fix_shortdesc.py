@@ -7,14 +7,34 @@ to preview. Optional: run after cqa_jtbd_validate.py to fix reported failures.
 """
 import argparse
 import csv
+import functools
+import os
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-# Regex to match AsciiDoc level-1 title (e.g. "= My Title")
-RE_TITLE = re.compile(r"^=+\s+(.+)$", re.MULTILINE)
-# Regex to find the [role="_abstract"] block that wraps the short description
-RE_ROLE_ABSTRACT = re.compile(r"^\[role=\"_abstract\"\]\s*$", re.MULTILINE)
+# File contents are held as bytes throughout to skip the whole-file UTF-8
+# decode/encode round-trip; only the title and abstract paragraph are decoded,
+# where lengths must be counted in characters. Regexes are bytes-mode to match.
+# Match AsciiDoc level-1 title (e.g. "= My Title")
+RE_TITLE = re.compile(rb"^=+\s+(.+)$", re.MULTILINE)
+# Contiguous run of blank, :attribute:, and // comment lines after the title
+RE_POST_TITLE = re.compile(rb"(?:[ \t]*(?:\r?\n|:[^\r\n]*\r?\n|//[^\r\n]*\r?\n))*")
+# Find the [role="_abstract"] block that wraps the short description
+RE_ROLE_ABSTRACT = re.compile(rb"^\[role=\"_abstract\"\]\s*$", re.MULTILINE)
+# One paragraph: consecutive non-blank lines, stopping before a blank line.
+# Raw bytes see CRLF endings verbatim (read_text used to normalize them), so
+# line breaks are \r?\n and content excludes both \r and \n.
+RE_PARA = re.compile(rb"[^\r\n]+(?:\r?\n[^\r\n]+)*")
+# Blank line that terminates a paragraph, in either line-ending style
+RE_PARA_END = re.compile(rb"\r?\n\r?\n")
+# Literal marker for fast yes/no presence tests (bytes.__contains__ is a
+# C-level memmem; the regex is only needed where the position matters)
+MARKER = b'[role="_abstract"]'
+# Number of bytes read per file before falling back to a full read; the title
+# and the [role="_abstract"] block are by convention near the top of the file
+PREFIX_BYTES = 8192
 # CQA 2.1 shortdesc length constraints (characters)
 SHORTDESC_MIN, SHORTDESC_MAX = 50, 300
 # Default suffix used to reach minimum length when deriving or expanding shortdesc
@@ -23,6 +43,27 @@ DEFAULT_SUFFIX = " Use this when writing or matching rules."
 OVERRIDES_FILENAME = "shortdesc_overrides.csv"
 
 
+def walk_adoc(root: Path):
+    """
+    Yield every .adoc file under root, skipping website and .git trees.
+    os.scandir exposes each entry's type without an extra stat, and a plain
+    endswith suffix test replaces rglob's per-entry fnmatch.
+    """
+    stack: list[str | Path] = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in ("website", ".git"):
+                        stack.append(entry.path)
+                elif entry.name.endswith(".adoc"):
+                    yield Path(entry.path)
+
+
 def load_shortdesc_overrides(repo: Path) -> dict[str, str]:
     """Load path -> shortdesc from repo/shortdesc_overrides.csv if present."""
     overrides = {}
@@ -32,10 +73,14 @@ def load_shortdesc_overrides(repo: Path) -> dict[str, str]:
     with path.open(encoding="utf-8", newline="") as f:
         for row in csv.reader(f):
             if len(row) >= 2:
-                overrides[row[0].strip()] = row[1].strip()
+                # Clip once at load time; add_abstract relies on this bound
+                overrides[row[0].strip()] = row[1].strip()[:SHORTDESC_MAX]
     return overrides
 
 
+# Pure function; generated docs repeat the same title across products and
+# versions, so identical inputs recur often enough to be worth memoizing
+@functools.lru_cache(maxsize=4096)
 def derive_shortdesc_from_title(title: str) -> str:
     """
     Build a CQA-compliant shortdesc from the topic title.
@@ -50,102 +95,140 @@ def derive_shortdesc_from_title(title: str) -> str:
     if len(candidate) <= SHORTDESC_MAX:
         return candidate if len(candidate) >= SHORTDESC_MIN else (candidate + DEFAULT_SUFFIX)[:SHORTDESC_MAX]
     # Too long: truncate at word boundary (leave room for "…")
-    truncated = base[: SHORTDESC_MAX - 1].rsplit(maxsplit=1)[0]
-    result = truncated + "…" if len(truncated) < len(base) else truncated
+    cut = base.rfind(" ", 0, SHORTDESC_MAX - 1)
+    if cut < 0:
+        cut = SHORTDESC_MAX - 1
+    result = base[:cut] + "…" if cut < len(base) else base
     if len(result) < SHORTDESC_MIN:
         result = (result + DEFAULT_SUFFIX)[:SHORTDESC_MAX]
     return result
 
 
-def first_paragraph_after_abstract(content: str) -> tuple[str, int, int]:
-    """Return (first_paragraph, start, end) after [role="_abstract"]."""
+def write_file(path: Path, new_content: bytes) -> None:
+    """
+    Replace path with new_content atomically: write a sibling temp file in a
+    single write() call, then os.replace over the original. A crash mid-write
+    can no longer leave a half-written .adoc behind. Callers only invoke this
+    after confirming the content actually changed.
+    """
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(new_content)
+    os.replace(tmp, path)
+
+
+def first_paragraph_after_abstract(content: bytes) -> tuple[str | None, int, int]:
+    """Return (first_paragraph, start, end) after [role="_abstract"]; offsets in bytes."""
     m = RE_ROLE_ABSTRACT.search(content)
     if not m:
         return None, -1, -1
-    # Paragraph runs from after the role line until the next blank line
-    start = m.end()
-    end = content.find("\n\n", start)
-    if end == -1:
-        end = len(content)
-    # Normalize newlines to spaces for a single-line paragraph string
-    para = content[start:end].replace("\n", " ").strip()
+    # One RE_PARA match yields the paragraph span directly (after the role
+    # line's newline); split/join collapses whitespace in a single allocation.
+    # Decode just the paragraph so length checks count characters, not bytes.
+    pm = RE_PARA.match(content, m.end() + 1)
+    if not pm:
+        return None, -1, -1
+    start, end = pm.span()
+    para = b" ".join(pm.group(0).split()).decode("utf-8", errors="replace")
     return para, start, end
 
-def add_abstract(content: str, title: str, shortdesc: str) -> str:
+def add_abstract(content: bytes, title: str, shortdesc: str) -> bytes:
     """Insert [role="_abstract"] and shortdesc after first = title (and :context: if present)."""
-    lines = content.split("\n")
-    out = []
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        out.append(line)
-        if re.match(r"^=+\s+", line):
-            # After = title, preserve blank lines, :attribute: lines, and // comments
-            i += 1
-            while i < len(lines):
-                next_line = lines[i]
-                if next_line.strip() == "" or next_line.strip().startswith(":") or next_line.strip().startswith("//"):
-                    out.append(next_line)
-                    i += 1
-                else:
-                    break
-            # Insert abstract block: blank line, role, shortdesc (capped), blank line
-            out.append("")
-            out.append('[role="_abstract"]')
-            out.append(shortdesc[:SHORTDESC_MAX])
-            out.append("")
-            continue
-        i += 1
-    return "\n".join(out)
+    m = RE_TITLE.search(content)
+    if not m:
+        return content
+    p = m.end()
+    if p < len(content):
+        p += 1  # skip the title's newline
+    else:
+        content += b"\n"
+        p = len(content)
+    # Preserve blank lines, :attribute: lines, and // comments after the title,
+    # then splice the abstract block in with a single copy of the body. Both
+    # shortdesc sources (overrides and derive_shortdesc_from_title) already
+    # cap at SHORTDESC_MAX, so no defensive slice is needed here.
+    insert = RE_POST_TITLE.match(content, p).end()
+    block = f'\n[role="_abstract"]\n{shortdesc}\n\n'.encode("utf-8")
+    return content[:insert] + block + content[insert:]
 
 def shorten_paragraph(para: str, max_len: int = 297) -> str:
     """Truncate at word boundary; append ellipsis if text was cut."""
     if len(para) <= max_len:
         return para
-    # Drop the last (partial) word to avoid mid-word cut
-    truncated = para[:max_len].rsplit(maxsplit=1)[0]
-    return truncated + "…" if len(truncated) < len(para) else truncated
-
-def fix_file(path: Path, repo: Path, dry_run: bool, missing_shortdescs: dict) -> bool:
-    """Apply fixes for one file (add abstract, shorten, or expand). Return True if file was modified."""
-    content = path.read_text(encoding="utf-8")
-    modified = False
-    try:
-        rel = path.relative_to(repo).as_posix()
-    except ValueError:
-        rel = path.as_posix()
-
-    # Case 1: File has no abstract and is in the known list — add [role="_abstract"] and shortdesc
-    if not RE_ROLE_ABSTRACT.search(content) and rel in missing_shortdescs:
-        shortdesc = missing_shortdescs[rel]
+    # Drop the last (partial) word to avoid mid-word cut; rfind avoids the
+    # list and substring allocations of rsplit
+    cut = para.rfind(" ", 0, max_len)
+    if cut < 0:
+        cut = max_len
+    return para[:cut] + "…"
+
+def process_file(
+    path: Path, repo_prefix: str, overrides: dict[str, str], dry_run: bool
+) -> tuple[str, str] | None:
+    """
+    Scan and fix one file (add abstract, shorten, or expand) with a single
+    read and at most one write. repo_prefix is str(repo) + os.sep, computed
+    once by the caller: a plain prefix strip replaces the per-file
+    relative_to/as_posix round-trip. The shortdesc is derived on the fly only
+    for files that actually lack an abstract. Returns (action, rel) when the
+    file was modified, else None.
+    """
+    path_str = str(path)
+    if not path_str.startswith(repo_prefix):
+        return None
+    rel = path_str[len(repo_prefix):].replace(os.sep, "/")
+
+    # Scan a bounded prefix first: the role block and title sit near the top,
+    # so a file whose abstract is already within limits needs no full read
+    with path.open("rb") as f:
+        head = f.read(PREFIX_BYTES)
+    head_complete = len(head) < PREFIX_BYTES
+    if MARKER in head:
+        para, _, end = first_paragraph_after_abstract(head)
+        # The prefix verdict only counts when the paragraph provably ended
+        # inside it: a terminating blank line, or the prefix is the whole file
+        if (
+            para
+            and SHORTDESC_MIN <= len(para) <= SHORTDESC_MAX
+            and (head_complete or RE_PARA_END.match(head, end))
+        ):
+            return None
+    content = head if head_complete else path.read_bytes()
+    action = None
+
+    # Case 1: File has no abstract — derive a shortdesc (override or title) and insert it
+    if MARKER not in content:
         title_m = RE_TITLE.search(content)
-        if title_m and shortdesc:
-            new_content = add_abstract(content, title_m.group(1), shortdesc)
-            if new_content != content:
-                if not dry_run:
-                    path.write_text(new_content, encoding="utf-8")
-                modified = True
-
-    # Case 2: Abstract exists but is too long — truncate at word boundary
-    para, start, end = first_paragraph_after_abstract(content)
-    if para and len(para) > SHORTDESC_MAX:
-        new_para = shorten_paragraph(para, SHORTDESC_MAX)
-        if new_para != para:
-            new_content = content[:start] + new_para + content[end:]
-            if not dry_run:
-                path.write_text(new_content, encoding="utf-8")
-            modified = True
-
-    # Case 3: Abstract exists but is too short — append generic suffix up to SHORTDESC_MAX
-    if para and len(para) < SHORTDESC_MIN:
-        new_para = (para + DEFAULT_SUFFIX)[:SHORTDESC_MAX]
-        if len(new_para) >= SHORTDESC_MIN:
-            new_content = content[:start] + new_para + content[end:]
-            if not dry_run:
-                path.write_text(new_content, encoding="utf-8")
-            modified = True
-
-    return modified
+        if title_m:
+            title = title_m.group(1).strip().decode("utf-8", errors="replace")
+            shortdesc = overrides.get(rel) or derive_shortdesc_from_title(title)
+            if shortdesc:
+                new_content = add_abstract(content, title, shortdesc)
+                if new_content != content:
+                    content = new_content
+                    action = "Fixed"
+
+    # Cases 2 and 3 only apply to pre-existing abstracts: an abstract just
+    # inserted by Case 1 is taken as-is (overrides in particular may sit below
+    # SHORTDESC_MIN on purpose and must not have the generic suffix appended).
+    if action is None:
+        para, start, end = first_paragraph_after_abstract(content)
+        if para and len(para) > SHORTDESC_MAX:
+            # Case 2: Abstract is too long — truncate at word boundary
+            new_para = shorten_paragraph(para, SHORTDESC_MAX)
+            if new_para != para:
+                content = content[:start] + new_para.encode("utf-8") + content[end:]
+                action = "Shortened"
+        elif para and len(para) < SHORTDESC_MIN:
+            # Case 3: Abstract is too short — append generic suffix up to SHORTDESC_MAX
+            new_para = (para + DEFAULT_SUFFIX)[:SHORTDESC_MAX]
+            if len(new_para) >= SHORTDESC_MIN:
+                content = content[:start] + new_para.encode("utf-8") + content[end:]
+                action = "Expanded"
+
+    if action and not dry_run:
+        write_file(path, content)
+    return (action, rel) if action else None
 
 
 def main() -> int:
@@ -172,62 +255,29 @@ def main() -> int:
 
     overrides = load_shortdesc_overrides(repo)
 
-    # Build map of relative path -> shortdesc for every file missing [role="_abstract"]
-    missing_shortdescs: dict[str, str] = {}
-    for path in repo.rglob("*.adoc"):
-        if "website" in path.parts:
-            continue
-        try:
-            rel = path.relative_to(repo).as_posix()
-        except ValueError:
-            continue
-        content = path.read_text(encoding="utf-8")
-        if RE_ROLE_ABSTRACT.search(content):
-            continue
-        # Use override if present, otherwise derive from title
-        title_m = RE_TITLE.search(content)
-        title = (title_m.group(1).strip()) if title_m else "This topic"
-        missing_shortdescs[rel] = overrides.get(rel) or derive_shortdesc_from_title(title)
+    # The per-file work is I/O-bound (reads, regex in C); threads release the GIL
+    paths = list(walk_adoc(repo))
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
 
     fixed = 0
-    # First pass: add missing abstracts
-    for rel in missing_shortdescs:
-        path = repo / rel
-        if path.is_file() and fix_file(path, repo, args.dry_run, missing_shortdescs):
-            fixed += 1
-            print("Fixed:", rel)
-
-    # Second pass: fix length (too long or too short) for files that already have an abstract
-    for path in repo.rglob("*.adoc"):
-        if "website" in path.parts:
-            continue
-        try:
-            rel = path.relative_to(repo).as_posix()
-        except ValueError:
-            continue
-        if rel in missing_shortdescs:
-            continue
-        content = path.read_text(encoding="utf-8")
-        para, start, end = first_paragraph_after_abstract(content)
-        if not para:
-            continue
-        if len(para) > SHORTDESC_MAX:
-            new_para = shorten_paragraph(para, SHORTDESC_MAX)
-            if new_para != para:
-                new_content = content[:start] + new_para + content[end:]
-                if not args.dry_run:
-                    path.write_text(new_content, encoding="utf-8")
-                fixed += 1
-                print("Shortened:", rel)
-        elif len(para) < SHORTDESC_MIN:
-            new_para = (para + DEFAULT_SUFFIX)[:SHORTDESC_MAX]
-            if len(new_para) >= SHORTDESC_MIN:
-                new_content = content[:start] + new_para + content[end:]
-                if not args.dry_run:
-                    path.write_text(new_content, encoding="utf-8")
+    # Single fused pass: every file is scanned and fixed in one worker call,
+    # deriving the shortdesc only when a file turns out to need one. Results
+    # are collected and printed from the main thread so output is not
+    # interleaved.
+    repo_prefix = str(repo) + os.sep
+
+    def fix_one(path: Path) -> tuple[str, str] | None:
+        return process_file(path, repo_prefix, overrides, args.dry_run)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for result in executor.map(fix_one, paths, chunksize=64):
+            if result:
+                action, rel = result
                 fixed += 1
-                print("Expanded:", rel)
+                print(f"{action}:", rel)
 
+    if args.dry_run:
+        print("derive_shortdesc cache:", derive_shortdesc_from_title.cache_info())
     print("Total changes:", fixed)
     return 0
 
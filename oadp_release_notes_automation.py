@@ -12,13 +12,24 @@ import os
 import sys
 import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 except ImportError:
     print("Install requests: pip install requests", file=sys.stderr)
     sys.exit(1)
 
+# Optional: ijson decodes search pages incrementally instead of materializing
+# the whole document. Without it, pages fall back to Response.json().
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # -----------------------------------------------------------------------------
 # Config (edit these)
 # -----------------------------------------------------------------------------
@@ -38,18 +49,36 @@ JIRA_FILTER_KNOWN_ID = os.environ.get("OADP_JIRA_FILTER_KNOWN", "")
 JIRA_USER = os.environ.get("JIRA_USER", "")
 JIRA_API_TOKEN = os.environ.get("JIRA_API_TOKEN") or os.environ.get("JIRA_API_KEY", "")
 
+# Shared session: keep-alive and connection pooling avoid a TCP/TLS handshake
+# per call, and transient JIRA errors are retried with backoff
+SESSION = requests.Session()
+SESSION.headers.update({"Accept": "application/json"})
+if JIRA_USER and JIRA_API_TOKEN:
+    SESSION.auth = (JIRA_USER, JIRA_API_TOKEN)
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=16,
+        # Retry's default allowed_methods excludes POST; the only POST on this
+        # session is the read-only /search call, which is safe to retry
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset({"GET", "POST"}),
+        ),
+    ),
+)
+
 # -----------------------------------------------------------------------------
 # JIRA API
 # -----------------------------------------------------------------------------
 
 
 def jira_request(method: str, path: str, **kwargs) -> requests.Response:
-    """Call JIRA REST API with auth."""
-    url = f"{JIRA_BASE_URL}{path}"
-    auth = None
-    if JIRA_USER and JIRA_API_TOKEN:
-        auth = (JIRA_USER, JIRA_API_TOKEN)
-    return requests.request(method, url, auth=auth, timeout=30, **kwargs)
+    """Call JIRA REST API on the shared session (auth is preset from the environment)."""
+    return SESSION.request(method, f"{JIRA_BASE_URL}{path}", timeout=30, **kwargs)
 
 
 def get_filter_jql(filter_id: str) -> str:
@@ -59,32 +88,73 @@ def get_filter_jql(filter_id: str) -> str:
     return r.json().get("jql", "")
 
 
-def fetch_issues_from_filter(filter_id: str) -> list[dict]:
-    """Fetch issues matching the given JIRA filter. Returns list of {key, summary, link}."""
+def parse_search_page(stream) -> dict:
+    """
+    Incrementally parse one /search page with ijson, keeping only total and the
+    key of each issue instead of the full response envelope.
+    """
+    page = {"total": 0, "issues": []}
+    issue = None
+    for prefix, event, value in ijson.parse(stream):
+        if prefix == "total":
+            page["total"] = value
+        elif prefix == "issues.item" and event == "start_map":
+            issue = {"key": ""}
+        elif prefix == "issues.item.key":
+            issue["key"] = value or ""
+        elif prefix == "issues.item" and event == "end_map":
+            page["issues"].append(issue)
+    return page
+
+
+def fetch_issues_from_filter(filter_id: str) -> list[str]:
+    """Fetch issues matching the given JIRA filter. Returns the list of issue keys."""
     if not filter_id:
         return []
     jql = get_filter_jql(filter_id)
     if not jql:
         return []
-    issues = []
-    start = 0
-    page_size = 50
-    while True:
+    page_size = 100
+
+    # POST body form avoids URL-encoded JQL length limits; restricting fields
+    # and disabling expand/validation keeps the paged payloads small. The
+    # invariant part of the body is built once; each page only varies startAt.
+    body = {
+        "jql": jql,
+        "maxResults": page_size,
+        "fields": ["key"],
+        "fieldsByKeys": False,
+        "validateQuery": False,
+        "expand": [],
+    }
+
+    def fetch_page(start: int) -> dict:
         r = jira_request(
-            "GET",
+            "POST",
             "/rest/api/2/search",
-            params={"jql": jql, "startAt": start, "maxResults": page_size, "fields": "summary"},
+            json={**body, "startAt": start},
+            stream=ijson is not None,
         )
         r.raise_for_status()
-        data = r.json()
-        for item in data.get("issues", []):
-            key = item.get("key", "")
-            summary = (item.get("fields") or {}).get("summary", "")
-            link = f"{JIRA_BASE_URL}/browse/{key}" if key else ""
-            issues.append({"key": key, "summary": summary, "link": link})
-        start += page_size
-        if start >= data.get("total", 0):
-            break
+        if ijson is None:
+            return r.json()
+        r.raw.decode_content = True
+        return parse_search_page(r.raw)
+
+    # The first page reveals the total; the remaining pages are round-trip
+    # bound, so fetch them in parallel instead of waiting on each in turn
+    first = fetch_page(0)
+    pages = [first]
+    offsets = range(page_size, first.get("total", 0), page_size)
+    if offsets:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            pages.extend(executor.map(fetch_page, offsets))
+
+    # Only the keys are consumed downstream; a single .get per issue avoids
+    # both the double lookup and a per-issue dict allocation
+    issues: list[str] = []
+    for data in pages:
+        issues.extend(key for item in data.get("issues", []) if (key := item.get("key")))
     return issues
 
 
@@ -97,29 +167,29 @@ def filter_url(filter_id: str) -> str:
     """Return the shareable JIRA filter URL for the given filter ID."""
     if not filter_id:
         return ""
-    return f"{JIRA_BASE_URL}/issues/?filter={filter_id}"
+    return f"{JIRA_BASE_URL}/issues/?filter={quote(filter_id)}"
 
 
 def send_to_renoa(
     release: str,
-    resolved: list[dict],
-    known: list[dict],
+    resolved: list[str],
+    known: list[str],
     resolved_filter_id: str = "",
     known_filter_id: str = "",
 ) -> bool:
     """POST release number, ticket numbers, and filter URLs to RENOA. Returns True on success."""
+    # Build the payload once and branch only on the transport
+    payload = build_payload(
+        release, resolved, known, resolved_filter_id, known_filter_id
+    )
     if not RENOA_URL:
         print("RENOA_URL is not set. Skipping RENOA request.")
         print("Payload that would be sent:")
-        payload = build_payload(
-            release, resolved, known, resolved_filter_id, known_filter_id
-        )
         print(json.dumps(payload, indent=2))
         return False
 
-    payload = build_payload(
-        release, resolved, known, resolved_filter_id, known_filter_id
-    )
+    # Deliberately not SESSION: the session carries JIRA Basic-auth on every
+    # request it makes, and those credentials must not go to the RENOA host
     r = requests.post(RENOA_URL, json=payload, timeout=60)
     r.raise_for_status()
     return True
@@ -127,16 +197,16 @@ def send_to_renoa(
 
 def build_payload(
     release: str,
-    resolved: list[dict],
-    known: list[dict],
+    resolved: list[str],
+    known: list[str],
     resolved_filter_id: str = "",
     known_filter_id: str = "",
 ) -> dict:
     """Build the payload for RENOA: release, JIRA ticket numbers, and optional filter URLs."""
     payload = {
         "release": release,
-        "resolved_issues": [i["key"] for i in resolved if i.get("key")],
-        "known_issues": [i["key"] for i in known if i.get("key")],
+        "resolved_issues": resolved,
+        "known_issues": known,
     }
     resolved_url = filter_url(resolved_filter_id)
     known_url = filter_url(known_filter_id)